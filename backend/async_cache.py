@@ -0,0 +1,86 @@
+import asyncio
+import re
+from typing import Awaitable, Callable, Hashable
+
+from cachetools import LRUCache, TTLCache
+
+
+# ---------------------------------------------------------------------------
+# Async result caching  —  for the GPT / scrape lookups behind the step and
+# recipe endpoints. Concurrent misses for one key share a single call, so a
+# burst of identical requests costs one round-trip, not one each.
+# ---------------------------------------------------------------------------
+
+_MISSING = object()
+
+
+# Punctuation not wedged between two word characters — "1/2", "1.5" and "1-2"
+# keep theirs, since dropping it would merge them with "12" and "15"
+_LOOSE_PUNCT_RE = re.compile(r"(?<!\w)[^\w\s]+|[^\w\s]+(?!\w)")
+
+
+def normalize_key(text: str) -> str:
+    """
+    Lowercase, drop loose punctuation and collapse whitespace so trivial variants share a cache entry.
+
+    >>> normalize_key("  Add 1/2 cup of SUGAR! ")
+    'add 1/2 cup of sugar'
+    >>> normalize_key("Add 1/2 cup sugar") != normalize_key("Add 12 cup sugar")
+    True
+    """
+    return " ".join(_LOOSE_PUNCT_RE.sub("", text.lower()).split())
+
+
+class InFlight:
+    """Coalesces concurrent calls for the same key into one shared task."""
+
+    def __init__(self):
+        self._tasks: dict[Hashable, asyncio.Task] = {}
+
+    async def run(self, key: Hashable, fetch: Callable[[], Awaitable]):
+        """
+        Await fetch() for key, or join the call already running for it.
+
+        The shared task is shielded, so one caller disconnecting never cancels
+        the work the others are waiting on.
+        """
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fetch())
+            self._tasks[key] = task
+            task.add_done_callback(lambda _: self._tasks.pop(key, None))
+        return await asyncio.shield(task)
+
+
+class AsyncLRUCache:
+    """
+    LRU (optionally TTL) cache of coroutine results with in-flight coalescing.
+
+    Args:
+        maxsize:    Most entries kept.
+        ttl:        Seconds an entry stays valid; None keeps it until evicted.
+        cache_none: Whether a None result is worth remembering. Turn off when
+                    None means "failed, try again later" rather than an answer.
+    """
+
+    def __init__(self, maxsize: int, ttl: float | None = None, cache_none: bool = True):
+        self._cache = LRUCache(maxsize=maxsize) if ttl is None else TTLCache(maxsize=maxsize, ttl=ttl)
+        self._inflight = InFlight()
+        self._cache_none = cache_none
+
+    async def get_or_fetch(self, key: Hashable, fetch: Callable[[], Awaitable]):
+        """Return the cached value for key, running fetch() (once, however many callers) on a miss."""
+        value = self._cache.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        return await self._inflight.run(key, lambda: self._fetch_and_store(key, fetch))
+
+    def put(self, key: Hashable, value):
+        """Store a value fetched some other way, e.g. from a batch job."""
+        if value is not None or self._cache_none:
+            self._cache[key] = value
+
+    async def _fetch_and_store(self, key: Hashable, fetch: Callable[[], Awaitable]):
+        value = await fetch()
+        self.put(key, value)
+        return value
@@ -1,6 +1,8 @@
 import cv2
 import sounddevice as sd
 import numpy as np
+import asyncio
+import os
 import threading
 import queue
 import io
@@ -9,9 +11,11 @@ import wave
 import ctypes
 import platform
 import re as _re
-import json
+from concurrent.futures import ThreadPoolExecutor
 
-from chatgpt import vision_step_check, speech_response, transcribe_audio
+import orjson
+
+from chatgpt import vision_step_check, speech_response, transcribe_audio, encode_frame
 
 
 # ---------------------------------------------------------------------------
@@ -262,23 +266,57 @@ audio_queue         = queue.Queue()
 transcription_queue = queue.Queue()   # raw audio buffers → transcribe_worker
 speech_queue        = queue.Queue()   # (text, frame, step_label) → gpt_worker (priority)
 video_check_queue   = queue.Queue(maxsize=1)  # latest frame only, old dropped
-results_queue       = queue.Queue()   # parsed AI results → SSE stream
+results_queue       = queue.Queue()   # parsed AI results (when no listener is set)
 
 audio_running       = threading.Event()
 
+# Optional callback that receives every parsed AI result instead of
+# results_queue — server.py uses it to hand results straight to its event loop
+_result_listener    = None
+
+# Optional callback run (no args) after every captured frame and when the
+# pipeline stops — lets /camera/feed sleep until there's something to send
+_frame_listener     = None
+
 # Shared latest frame
 latest_frame        = None
 latest_frame_lock   = threading.Lock()
+_frame_seq          = 0     # bumped with every captured frame, so viewers can skip repeats
 
-# Previous frame for two-frame step checks
+# Previous frame for two-frame step checks, kept as the base64 JPEG already
+# sent to GPT so it's never copied or re-encoded
 _prev_frame_lock    = threading.Lock()
-_prev_frame         = None
+_prev_frame_b64     = None
 
 # VU meter
 vu_level      = 0.0
 vu_level_lock = threading.Lock()
 
 
+def set_result_listener(listener):
+    """Send every parsed AI result to listener(result) instead of results_queue (None to reset)."""
+    global _result_listener
+    _result_listener = listener
+
+
+def _publish_result(result: dict):
+    if _result_listener is not None:
+        _result_listener(result)
+    else:
+        results_queue.put(result)
+
+
+def set_frame_listener(listener):
+    """Call listener() on every new frame and on pipeline stop (None to reset)."""
+    global _frame_listener
+    _frame_listener = listener
+
+
+def _notify_frame():
+    if _frame_listener is not None:
+        _frame_listener()
+
+
 # ---------------------------------------------------------------------------
 # Audio capture + VAD
 # ---------------------------------------------------------------------------
@@ -418,7 +456,6 @@ def gpt_worker():
     Speech items  -> speech_response()   -> conversational reply -> SSE "speech" event
     Video items   -> vision_step_check() -> JSON step check      -> SSE "step_check" event
     """
-    import json
     global LAST_STEP_MESSAGE
     while audio_running.is_set() or not speech_queue.empty():
         # Speech has priority
@@ -458,7 +495,7 @@ def gpt_worker():
                 if not audio_running.is_set():
                     continue
 
-                results_queue.put({
+                _publish_result({
                     "type":  "speech",
                     "step":  step_label,
                     "data":  "".join(chunks),
@@ -473,13 +510,14 @@ def gpt_worker():
             if not CURRENT_STEP:
                 continue
 
+            frame_b64 = encode_frame(frame)
             with _prev_frame_lock:
-                global _prev_frame
-                prev = _prev_frame.copy() if _prev_frame is not None else None
-                _prev_frame = frame.copy()
+                global _prev_frame_b64
+                prev_b64 = _prev_frame_b64
+                _prev_frame_b64 = frame_b64
 
             try:
-                raw = vision_step_check(CURRENT_STEP, frame, previous_frame=prev)
+                raw = vision_step_check(CURRENT_STEP, frame_b64, previous_frame_b64=prev_b64)
                 print(f"[AI] {raw}")
 
                 if not audio_running.is_set():
@@ -490,8 +528,8 @@ def gpt_worker():
                 clean = _re.sub(r"\s*```$", "", clean.strip())
 
                 try:
-                    data = json.loads(clean)
-                except json.JSONDecodeError:
+                    data = orjson.loads(clean)
+                except orjson.JSONDecodeError:
                     # Non-JSON response — discard, don't bleed into speech channel
                     print("[Step Check] Non-JSON response discarded.")
                     continue
@@ -508,7 +546,7 @@ def gpt_worker():
 
                     LAST_STEP_MESSAGE = new_action_msg
 
-                results_queue.put({
+                _publish_result({
                     "type": "step_check",
                     "step": step_label,
                     "data": data,
@@ -529,7 +567,7 @@ def get_camo_feed(camera_index=None, audio_device_index=None):
         camera_index:       Video device index. Auto-detected if None.
         audio_device_index: Audio device index. Auto-detected if None.
     """
-    global latest_frame, _prev_frame
+    global latest_frame, _frame_seq, _prev_frame_b64
 
     # --- Video setup ---
     if camera_index is None:
@@ -579,7 +617,7 @@ def get_camo_feed(camera_index=None, audio_device_index=None):
 
     # --- Start workers ---
     audio_running.set()
-    _prev_frame = None
+    _prev_frame_b64 = None
 
     video_thread = threading.Thread(target=video_worker, daemon=True)
     gpt_thread   = threading.Thread(target=gpt_worker,   daemon=True)
@@ -601,8 +639,11 @@ def get_camo_feed(camera_index=None, audio_device_index=None):
             break
         with latest_frame_lock:
             latest_frame = frame.copy()
+            _frame_seq += 1
+        _notify_frame()
 
     audio_running.clear()
+    _notify_frame()
     cap.release()
     print("[Feed] Stopped.")
 
@@ -611,13 +652,59 @@ def get_camo_feed(camera_index=None, audio_device_index=None):
 # MJPEG helper
 # ---------------------------------------------------------------------------
 
-def get_latest_frame_jpeg(quality: int = 70) -> bytes | None:
-    with latest_frame_lock:
-        frame = latest_frame.copy() if latest_frame is not None else None
-    if frame is None:
-        return None
-    _, buf = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
-    return buf.tobytes()
+# Dedicated pool for JPEG encodes requested from async code, so a feed
+# connection never runs cv2.imencode on the server's event loop
+_ENCODE_POOL = ThreadPoolExecutor(
+    max_workers=max(2, (os.cpu_count() or 2) // 2),
+    thread_name_prefix="jpeg-encode",
+)
+
+
+# Newest encoded frame, (seq, quality, jpeg) — every feed viewer asking for the
+# same frame shares one encode. _encode_lock makes concurrent askers wait for
+# that encode instead of duplicating it.
+_encoded_frame: tuple[int, int, memoryview] | None = None
+_encode_lock = threading.Lock()
+
+
+def get_latest_frame_jpeg(quality: int = 70, last_seq: int | None = None) -> tuple[int, memoryview | None]:
+    """
+    JPEG-encode the newest camera frame.
+
+    Args:
+        quality:  JPEG quality, 0-100.
+        last_seq: Sequence number of the frame the caller already has.
+
+    Returns:
+        (seq, jpeg). jpeg is a read-only view of the encoded bytes, shared by
+        all callers for that frame. It is None when there is no frame yet, or
+        when the newest frame is still last_seq — nothing is encoded then.
+    """
+    global _encoded_frame
+    with _encode_lock:
+        with latest_frame_lock:
+            seq = _frame_seq
+            # The capture loop swaps in a fresh array per frame and never
+            # writes to one it has published, so no defensive copy is needed
+            frame = latest_frame
+        if frame is None or seq == last_seq:
+            return seq, None
+        if _encoded_frame is not None and _encoded_frame[:2] == (seq, quality):
+            return seq, _encoded_frame[2]
+
+        _, buf = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        jpeg = memoryview(buf).cast("B").toreadonly()  # wraps cv2's buffer, no copy
+        _encoded_frame = (seq, quality, jpeg)
+        return seq, jpeg
+
+
+async def get_latest_frame_jpeg_async(quality: int = 70, last_seq: int | None = None) -> tuple[int, memoryview | None]:
+    """Same as get_latest_frame_jpeg(), but the encode runs on _ENCODE_POOL."""
+    # Unchanged frame: answer on the loop without a trip through the pool
+    if _frame_seq == last_seq:
+        return last_seq, None
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_ENCODE_POOL, get_latest_frame_jpeg, quality, last_seq)
 
 
 # ---------------------------------------------------------------------------
@@ -635,6 +722,7 @@ def _flush_queue(q: queue.Queue):
 def stop_pipeline():
     """Stop all workers and flush all queues immediately."""
     audio_running.clear()
+    _notify_frame()
     _flush_queue(audio_queue)
     _flush_queue(transcription_queue)
     _flush_queue(video_check_queue)
@@ -1,18 +1,39 @@
-import json
+import asyncio
+import re
 
-from openai import OpenAI
-from dotenv import load_dotenv
+import orjson
 
-load_dotenv()
-client = OpenAI()
+from async_cache import AsyncLRUCache
+from openai_client import client
 
+# Keyed by the exact step text (case and outer whitespace aside) — a safety
+# answer borrowed from a similar-looking step is worse than a miss. The
+# frontend asks again on every rerender, and a None ("no risk" / "no
+# allergens") is as final as any other answer
+_safety_cache = AsyncLRUCache(maxsize=4096)
+_allergens_cache = AsyncLRUCache(maxsize=4096)
 
-def get_safety_caution(step: str) -> dict | None:
+# Finishing steps that need no GPT call for either check. Only a bare sign-off
+# qualifies — "Serve in the sizzling skillet" or "Garnish with peanuts" open
+# harmlessly, and no word list catches every hazard or allergen after the verb.
+_SIGN_OFF_RE = re.compile(
+    r"^\s*(serve|enjoy)(\s+(immediately|right\s+away|at\s+once|and\s+enjoy))?\s*[.!]*\s*$",
+    re.I,
+)
+
+
+async def get_safety_caution(step: str) -> dict | None:
     """
     Generate a safety caution and prevention tip for a recipe step if relevant.
     Returns {"caution": str, "tip": str}, or None if the step has no safety concerns.
     """
-    response = client.chat.completions.create(
+    if _SIGN_OFF_RE.match(step):
+        return None
+    return await _safety_cache.get_or_fetch(step.strip().lower(), lambda: _ask_safety_caution(step))
+
+
+async def _ask_safety_caution(step: str) -> dict | None:
+    response = await client.chat.completions.create(
         model="gpt-4o",
         messages=[
             {
@@ -37,18 +58,24 @@ def get_safety_caution(step: str) -> dict | None:
 
     try:
         cleaned = result.replace("```json", "").replace("```", "").strip()
-        return json.loads(cleaned)
+        return orjson.loads(cleaned)
     except Exception:
         return {"caution": result, "tip": None}
 
 
-def get_allergens(step: str) -> list[str] | None:
+async def get_allergens(step: str) -> list[str] | None:
     """
     Detect common allergens present in a recipe step.
     Returns a list of allergen names, or None if none found.
     Common allergens: gluten, dairy, eggs, nuts, peanuts, soy, fish, shellfish, sesame.
     """
-    response = client.chat.completions.create(
+    if _SIGN_OFF_RE.match(step):
+        return None
+    return await _allergens_cache.get_or_fetch(step.strip().lower(), lambda: _ask_allergens(step))
+
+
+async def _ask_allergens(step: str) -> list[str] | None:
+    response = await client.chat.completions.create(
         model="gpt-4o",
         messages=[
             {
@@ -72,20 +99,20 @@ def get_allergens(step: str) -> list[str] | None:
 
     try:
         cleaned = result.replace("```json", "").replace("```", "").strip()
-        allergens = json.loads(cleaned)
+        allergens = orjson.loads(cleaned)
         allergens = [a for a in allergens if a.strip().lower() not in ("none", "n/a", "na", "")]
         return allergens if allergens else None
     except Exception:
         return None
 
 
-def get_recipe_allergens(food: str) -> list[str] | None:
+async def get_recipe_allergens(food: str) -> list[str] | None:
     """
     Scan a whole dish/drink for ALL potentially allergenic ingredients.
     Returns a list of specific allergen names, or None if none found.
     Covers both the 9 major allergens and specific ingredients (e.g. kiwi, avocado, mustard).
     """
-    response = client.chat.completions.create(
+    response = await client.chat.completions.create(
         model="gpt-4o",
         messages=[
             {
@@ -111,7 +138,7 @@ def get_recipe_allergens(food: str) -> list[str] | None:
 
     try:
         cleaned = result.replace("```json", "").replace("```", "").strip()
-        allergens = json.loads(cleaned)
+        allergens = orjson.loads(cleaned)
         allergens = [a for a in allergens if a.strip().lower() not in ("none", "n/a", "na", "")]
         return allergens if allergens else None
     except Exception:
@@ -121,14 +148,16 @@ def get_recipe_allergens(food: str) -> list[str] | None:
 if __name__ == "__main__":
     step = input("Enter a recipe step: ")
 
-    caution = get_safety_caution(step)
+    async def _demo():
+        return await asyncio.gather(get_safety_caution(step), get_allergens(step))
+
+    caution, allergens = asyncio.run(_demo())
     print(f"[safety] {caution}")
     if caution:
         print(f"\n⚠️  {caution['caution']}")
         if caution.get("tip"):
             print(f"💡 {caution['tip']}")
 
-    allergens = get_allergens(step)
     print(f"\n[allergens] {allergens}")
     if allergens:
         print(f"\n🥜 Allergens: {', '.join(allergens)}")
@@ -1,21 +1,20 @@
-from openai import OpenAI
-from dotenv import load_dotenv
+from collections import deque
 import base64
+import orjson
 import cv2
 
-load_dotenv()
-
-client = OpenAI()
+from openai_client import client as async_client, sync_client as client
+from prompts import TASK_DECOMP_PREFIX
 
 # ---------------------------------------------------------------------------
 # Conversation history — speech only (step checks never go into history)
 # ---------------------------------------------------------------------------
 
-conversation_history = []
 MAX_HISTORY = 20  # max messages kept (= 10 back-and-forth exchanges)
 
-# The last frame sent — included as "previous frame" in every call with vision
-_previous_frame = None
+# Ring buffer — appending past MAX_HISTORY drops the oldest message in O(1).
+# Exchanges are always appended in user/assistant pairs, so pairs stay intact.
+conversation_history: deque = deque(maxlen=MAX_HISTORY)
 
 
 # ---------------------------------------------------------------------------
@@ -49,18 +48,30 @@ _SPEECH_SYSTEM = (
 # Helpers
 # ---------------------------------------------------------------------------
 
-def _encode_frame(frame) -> str:
-    """Encode a cv2 BGR frame to a base64 JPEG string."""
-    _, buf = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 75])
+# With "detail": "low" OpenAI shrinks every image to 512px anyway, so there's
+# no point encoding or uploading more pixels than that.
+MAX_FRAME_SIDE = 512
+
+
+def downscale_frame(frame):
+    """Shrink a cv2 BGR frame so its longest side is at most MAX_FRAME_SIDE."""
+    h, w = frame.shape[:2]
+    scale = MAX_FRAME_SIDE / max(h, w)
+    if scale >= 1.0:
+        return frame
+    return cv2.resize(frame, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+
+
+def encode_frame(frame) -> str:
+    """Downscale a cv2 BGR frame and encode it to a base64 JPEG string."""
+    _, buf = cv2.imencode(".jpg", downscale_frame(frame), [cv2.IMWRITE_JPEG_QUALITY, 75])
     return base64.b64encode(buf).decode("utf-8")
 
 
 def _append_history(user_text: str, assistant_text: str):
-    """Append an exchange to conversation_history and trim to MAX_HISTORY."""
+    """Append an exchange to conversation_history (the deque trims itself to MAX_HISTORY)."""
     conversation_history.append({"role": "user", "content": user_text})
     conversation_history.append({"role": "assistant", "content": assistant_text})
-    if len(conversation_history) > MAX_HISTORY:
-        del conversation_history[:2]
 
 
 # ---------------------------------------------------------------------------
@@ -89,14 +100,18 @@ def transcribe_audio(wav_buffer) -> str:
 # Vision step check  —  JSON only, never enters conversation history
 # ---------------------------------------------------------------------------
 
-def vision_step_check(step: str, frame, previous_frame=None) -> str:
+def vision_step_check(step: str, frame_b64: str, previous_frame_b64: str | None = None) -> str:
     """
     Analyze one or two camera frames and return a raw JSON step-check result.
 
+    Frames are passed already encoded (see encode_frame()) so the caller can
+    hand this check's frame_b64 back as previous_frame_b64 on the next check
+    instead of keeping — and re-encoding — the raw pixels.
+
     Args:
-        step:           The current recipe step to verify.
-        frame:          Current cv2 BGR frame.
-        previous_frame: Previous cv2 BGR frame (or None for first check).
+        step:               The current recipe step to verify.
+        frame_b64:          Current frame as a base64 JPEG string.
+        previous_frame_b64: Previous frame as a base64 JPEG string (or None for first check).
 
     Returns:
         Raw JSON string from GPT (caller is responsible for parsing).
@@ -148,16 +163,16 @@ def vision_step_check(step: str, frame, previous_frame=None) -> str:
     )
 
     content = []
-    if previous_frame is not None:
+    if previous_frame_b64 is not None:
         content.append({"type": "text", "text": "Previous frame:"})
         content.append({
             "type": "image_url",
-            "image_url": {"url": f"data:image/jpeg;base64,{_encode_frame(previous_frame)}", "detail": "low"},
+            "image_url": {"url": f"data:image/jpeg;base64,{previous_frame_b64}", "detail": "low"},
         })
     content.append({"type": "text", "text": "Current frame:"})
     content.append({
         "type": "image_url",
-        "image_url": {"url": f"data:image/jpeg;base64,{_encode_frame(frame)}", "detail": "low"},
+        "image_url": {"url": f"data:image/jpeg;base64,{frame_b64}", "detail": "low"},
     })
     content.append({"type": "text", "text": prompt})
 
@@ -214,7 +229,7 @@ def speech_response(user_text: str, frame=None, recipe: str = None, current_step
             {"type": "text", "text": "Current frame:"},
             {
                 "type": "image_url",
-                "image_url": {"url": f"data:image/jpeg;base64,{_encode_frame(frame)}", "detail": "low"},
+                "image_url": {"url": f"data:image/jpeg;base64,{encode_frame(frame)}", "detail": "low"},
             },
             {"type": "text", "text": user_text},
         ]
@@ -243,56 +258,12 @@ def speech_response(user_text: str, frame=None, recipe: str = None, current_step
 # Task decomposition
 # ---------------------------------------------------------------------------
 
-_TASK_DECOMP_SYSTEM = """You are a recipe decomposition engine for a real-time AI vision cooking assistant.
-Given a food or drink to make, break it into ordered preparation steps that a camera can verify one frame at a time.
-
-Rules for every step:
-- ONE INGREDIENT OR ONE ACTION PER STEP. Never combine multiple ingredients into a single step. "Add flour and sugar" must be two separate steps.
-- Describes a single visible state of ingredients or tools (not an action in motion)
-- Can be confirmed TRUE or FALSE from one video frame (e.g. "bread is on the plate", "ice is in the glass")
-- Written as one short imperative sentence (max 10 words)
-- No time-based instructions ("wait 2 minutes") — visible state only
-- Cover the full recipe from start to finish
-- If a step requires a specific kitchen tool (knife, peeler, grater, pan, etc.), name it explicitly in the step (e.g. "cut apple into slices using a knife")
-- Include an approximate single-serving measurement for every ingredient the first time it appears in a step (e.g. "2 tbsp of peanut butter", "1 cup of milk", "3g of matcha powder"). Assume the recipe makes exactly one portion.
-- Err on the side of MORE steps. It is much better to have too many small steps than too few big ones.
-
-Return ONLY a raw JSON array of strings. No markdown, no explanation, no extra keys."""
-
-_TASK_DECOMP_EXAMPLES = [
-    {
-        "role": "user",
-        "content": "Task: Make a peanut butter and jelly sandwich"
-    },
-    {
-        "role": "assistant",
-        "content": '["Two slices of bread are laid flat on a surface", "A butter knife is placed next to the bread", "2 tbsp of peanut butter is scooped with the knife", "Peanut butter is spread across one slice", "1½ tbsp of jelly is scooped with the knife", "Jelly is spread across the other slice", "Both slices are pressed together face-down"]'
-    },
-    {
-        "role": "user",
-        "content": "Task: Make iced coffee"
-    },
-    {
-        "role": "assistant",
-        "content": '["A glass is placed on a flat surface", "½ cup of ice cubes is added to the glass", "180ml of brewed coffee is poured over the ice", "2 tbsp of milk or creamer is added to the glass", "Drink is stirred with a spoon"]'
-    },
-    {
-        "role": "user",
-        "content": "Task: Make a bowl of cereal"
-    },
-    {
-        "role": "assistant",
-        "content": '["A bowl is placed on a flat surface", "1 cup of cereal is poured into the bowl", "½ cup of milk is poured over the cereal"]'
-    },
-    {
-        "role": "user",
-        "content": "Task: Make avocado toast"
-    },
-    {
-        "role": "assistant",
-        "content": '["A slice of bread is placed on a flat surface", "Bread is placed in the toaster", "Toasted bread is placed back on the surface", "½ an avocado is halved using a knife", "Avocado pit is removed", "Avocado flesh is scooped onto the toast", "Avocado is spread across the toast using a butter knife", "A pinch of salt is sprinkled on top", "A pinch of pepper is sprinkled on top"]'
-    },
-]
+def _task_decomp_messages(task: str, avoid: list[str] | None = None) -> list[dict]:
+    """Build the few-shot message list for a task decomposition request."""
+    user_content = f"Task: {task}"
+    if avoid:
+        user_content += f"\nSubstitute these allergens with safe alternatives: {', '.join(avoid)}"
+    return [*TASK_DECOMP_PREFIX, {"role": "user", "content": user_content}]
 
 
 def generate_task_steps(task: str, avoid: list[str] | None = None) -> list[str]:
@@ -302,20 +273,69 @@ def generate_task_steps(task: str, avoid: list[str] | None = None) -> list[str]:
     Returns:
         List of step strings in order.
     """
-    import json
-
-    messages = [{"role": "system", "content": _TASK_DECOMP_SYSTEM}]
-    messages.extend(_TASK_DECOMP_EXAMPLES)
-    user_content = f"Task: {task}"
-    if avoid:
-        user_content += f"\nSubstitute these allergens with safe alternatives: {', '.join(avoid)}"
-    messages.append({"role": "user", "content": user_content})
-
     response = client.chat.completions.create(
         model="gpt-4o",
-        messages=messages,
+        messages=_task_decomp_messages(task, avoid),
         temperature=0.3,
     )
 
     raw = response.choices[0].message.content.strip()
-    return json.loads(raw)
+    return orjson.loads(raw)
+
+
+async def _iter_array_strings(chunks):
+    """
+    Incrementally parse a streamed JSON array of strings.
+
+    Yields each element as soon as its closing quote arrives, so callers can
+    start on step 1 while GPT is still writing step 2. Anything outside a
+    string literal (brackets, commas, stray markdown fences) is ignored.
+    """
+    literal = []
+    in_string = False
+    escaped = False
+    async for chunk in chunks:
+        for ch in chunk:
+            if not in_string:
+                if ch == '"':
+                    in_string = True
+                    literal.append(ch)
+                continue
+
+            literal.append(ch)
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+                yield orjson.loads("".join(literal))
+                literal = []
+
+
+async def generate_task_steps_stream(task: str, avoid: list[str] | None = None):
+    """
+    Streaming variant of generate_task_steps(), on the shared async client.
+
+    Closing or cancelling the generator closes the upstream GPT stream, so a
+    client that disconnects mid-recipe stops the generation it was paying for.
+
+    Yields:
+        Step strings in order, each one as soon as GPT has finished writing it.
+    """
+    response = await async_client.chat.completions.create(
+        model="gpt-4o",
+        messages=_task_decomp_messages(task, avoid),
+        temperature=0.3,
+        stream=True,
+    )
+
+    async def _deltas():
+        async for chunk in response:
+            delta = chunk.choices[0].delta.content
+            if delta:
+                yield delta
+
+    async with response:
+        async for step in _iter_array_strings(_deltas()):
+            yield step
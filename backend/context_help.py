@@ -1,60 +1,84 @@
+import asyncio
+import logging
 import re
 import html
-import urllib.parse
-import requests
-from openai import OpenAI
-from dotenv import load_dotenv
+import httpx
+from async_cache import AsyncLRUCache, normalize_key
+from openai_client import client
+from prompts import DETAILS_SYSTEM, IMAGE_QUERY_SYSTEM
 
-load_dotenv()
-client = OpenAI()
+logger = logging.getLogger(__name__)
+
+# Caps in-flight GPT calls when a whole recipe is hydrated at once, so a long
+# recipe doesn't trip OpenAI's per-minute request limit
+_OPENAI_CONCURRENCY = asyncio.Semaphore(20)
 
 
 # --- Image URL via direct Bing scrape ---
 
-def _get_image_url(query: str) -> str | None:
+# Bing starts throttling scrapes far sooner than OpenAI limits requests, so
+# image lookups get their own, much tighter cap
+_BING_CONCURRENCY = asyncio.Semaphore(4)
+
+# One keep-alive client for every lookup, so repeat searches reuse the
+# open connection to Bing instead of handshaking each time. HTTP/2 lets the
+# concurrent lookups for a whole recipe share that single connection.
+_BING_CLIENT = httpx.AsyncClient(
+    http2=True,
+    headers={
+        "User-Agent": (
+            "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
+            "AppleWebKit/537.36 (KHTML, like Gecko) "
+            "Chrome/124.0.0.0 Safari/537.36"
+        ),
+        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+        "Accept-Language": "en-US,en;q=0.9",
+    },
+    limits=httpx.Limits(max_keepalive_connections=20),
+    timeout=8,
+    follow_redirects=True,
+)
+
+
+async def _get_image_url(query: str) -> str | None:
     """Scrape Bing Image Search for the first result URL."""
     try:
-        url = "https://www.bing.com/images/search?" + urllib.parse.urlencode({"q": query, "first": 1})
-        headers = {
-            "User-Agent": (
-                "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
-                "AppleWebKit/537.36 (KHTML, like Gecko) "
-                "Chrome/124.0.0.0 Safari/537.36"
-            ),
-            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
-            "Accept-Language": "en-US,en;q=0.9",
-        }
-        resp = requests.get(url, headers=headers, timeout=8)
+        async with _BING_CONCURRENCY:
+            resp = await _BING_CLIENT.get(
+                "https://www.bing.com/images/search",
+                params={"q": query, "first": 1, "form": "HDRSC2"},
+            )
         resp.raise_for_status()
 
         # Bing HTML-encodes quotes as &quot; — decode first, then extract murl values
         decoded = html.unescape(resp.text)
-        matches = re.findall(r'"murl"\s*:\s*"(https?://[^"]+)"', decoded)
-        if matches:
-            return matches[0]
+        match = re.search(r'"murl"\s*:\s*"(https?://[^"]+)"', decoded)
+        if match:
+            return match.group(1)
     except Exception as e:
-        print(f"[context_help] Bing image search failed: {e}")
+        logger.warning("Bing image search failed: %s", e)
 
     return None
 
 
 # --- Step context ---
 
-_DETAILS_SYSTEM = """You are a cooking assistant. Given a recipe step, describe ONLY the key action in one sentence.
-Focus on the technique or motion — skip setup instructions and ingredient prep.
-
-Examples:
-Step: "Matcha and water are whisked until frothy"
-→ Use a bamboo whisk (chasen) in a brisk zigzag motion until the mixture is smooth and frothy with a layer of bubbles on the surface.
+# Exact-match caches keyed by the normalised step text. The same steps come up
+# across recipes and users constantly ("A bowl is placed on the counter"), and
+# a hit skips the GPT round-trip (or Bing scrape) entirely. A step that found
+# no image isn't remembered, so the next request searches again.
+_details_cache = AsyncLRUCache(maxsize=4096)
+_image_query_cache = AsyncLRUCache(maxsize=4096)
+_image_url_cache = AsyncLRUCache(maxsize=4096, cache_none=False)
 
-Step: "Peanut butter is spread across one slice"
-→ Use a butter knife to spread a generous, even layer of peanut butter across one slice of bread, reaching the edges.
 
-Step: "Drink is stirred with a spoon"
-→ Use a long spoon to stir from the bottom up a few times until the layers are evenly mixed."""
+# System messages shared by every call, never mutated — the byte-identical
+# prefix is what OpenAI's prompt cache matches on
+_DETAILS_SYS_MSG = {"role": "system", "content": DETAILS_SYSTEM}
+_IMAGE_QUERY_SYS_MSG = {"role": "system", "content": IMAGE_QUERY_SYSTEM}
 
 
-def get_step_details(step: str) -> dict:
+async def get_step_details(step: str) -> dict:
     """
     Returns a brief one-sentence explanation of how to perform the step.
 
@@ -64,21 +88,55 @@ def get_step_details(step: str) -> dict:
     Returns:
         {"step": str, "details": str}
     """
-    response = client.chat.completions.create(
-        model="gpt-4o",
-        messages=[
-            {"role": "system", "content": _DETAILS_SYSTEM},
-            {"role": "user", "content": f"Step: {step}"},
-        ],
-        temperature=0.3,
-    )
+    async def _fetch() -> str:
+        async with _OPENAI_CONCURRENCY:
+            response = await client.chat.completions.create(
+                model="gpt-4o",
+                messages=[
+                    _DETAILS_SYS_MSG,
+                    {"role": "user", "content": f"Step: {step}"},
+                ],
+                temperature=0.3,
+            )
+        return response.choices[0].message.content.strip()
+
     return {
         "step": step,
-        "details": response.choices[0].message.content.strip(),
+        "details": await _details_cache.get_or_fetch(normalize_key(step), _fetch),
     }
 
 
-def get_step_image(step: str, recipe: str | None = None) -> dict:
+async def get_all_step_details(steps: list[str]) -> list[dict]:
+    """
+    get_step_details() for every step, run concurrently.
+
+    Returns:
+        [{"step": str, "details": str}, ...] in the same order as steps.
+    """
+    return await asyncio.gather(*(get_step_details(step) for step in steps))
+
+
+async def _image_query(step: str) -> str:
+    """Ask GPT for a short kitchen/food-specific image search query for a step."""
+    async def _fetch() -> str:
+        async with _OPENAI_CONCURRENCY:
+            response = await client.chat.completions.create(
+                model="gpt-4o",
+                messages=[
+                    _IMAGE_QUERY_SYS_MSG,
+                    {"role": "user", "content": f"Step: {step}"},
+                ],
+                temperature=0.3,
+            )
+        return response.choices[0].message.content.strip().strip('"\'')
+
+    query = await _image_query_cache.get_or_fetch(normalize_key(step), _fetch)
+
+    logger.info("Image query: %s", query)
+    return query
+
+
+async def get_step_image(step: str, recipe: str | None = None) -> dict:
     """
     Returns an image URL showing what the completed state of the step looks like.
 
@@ -89,59 +147,89 @@ def get_step_image(step: str, recipe: str | None = None) -> dict:
     Returns:
         {"step": str, "image_url": str | None}
     """
-    # Ask GPT for a kitchen/food-specific search query for this step
-    query_response = client.chat.completions.create(
-        model="gpt-4o",
-        messages=[
-            {
-                "role": "system",
-                "content": (
-                    "Given a cooking recipe step, return ONLY the key subject (3-5 words max) that describes what the result looks like.\n"
-                    "Strip away all fluff — just the core object or food state.\n"
-                    "Think: what would you Google to find the simplest, most basic photo of this?\n\n"
-                    "Example: Step: 'A mug is placed on the counter' → 'empty white mug'\n"
-                    "Example: Step: 'A bowl is placed on a flat surface' → 'empty mixing bowl'\n"
-                    "Example: Step: 'Matcha powder is sifted into a mug' → 'matcha powder in mug'\n"
-                    "Example: Step: 'Butter is melted in a pan' → 'melted butter in pan'\n"
-                    "Example: Step: 'Eggs and sugar are whisked together' → 'whisked eggs and sugar'\n"
-                    "Example: Step: 'Dough is kneaded on a floured surface' → 'kneaded dough ball'\n"
-                    "Return only the search subject, nothing else."
-                ),
-            },
-            {"role": "user", "content": f"Step: {step}"},
-        ],
-        temperature=0.3,
+    return {
+        "step": step,
+        "image_url": await _find_image(step, await _image_query(step)),
+    }
+
+
+async def get_all_step_images(steps: list[str]) -> list[dict]:
+    """
+    get_step_image() for every step, pipelined: all GPT query rewrites start at
+    once, and each step's Bing lookup fires as soon as its own query is ready.
+
+    Returns:
+        [{"step": str, "image_url": str | None}, ...] in the same order as steps,
+        with image_url None for any step whose lookup failed.
+    """
+    async def _one(step: str) -> dict:
+        # One failed step comes back without an image instead of failing the batch
+        try:
+            image_url = await _find_image(step, await _image_query(step))
+        except Exception as e:
+            logger.warning("Image lookup failed for step %r: %s", step, e)
+            image_url = None
+        return {"step": step, "image_url": image_url}
+
+    return await asyncio.gather(*(_one(step) for step in steps))
+
+
+def seed_step_context(results: dict[str, dict]):
+    """
+    Prime the details and image-query caches with finished batch results, so
+    the live endpoints answer those steps without another GPT call.
+
+    Args:
+        results: {step: {"details": str | None, "image_query": str | None}},
+                 as returned by openai_batch.poll_and_fetch().
+    """
+    for step, result in results.items():
+        key = normalize_key(step)
+        # A None means that request failed in the batch — leave it to a live call
+        if result.get("details") is not None:
+            _details_cache.put(key, result["details"])
+        if result.get("image_query") is not None:
+            _image_query_cache.put(key, result["image_query"])
+
+
+async def _find_image(step: str, query: str) -> str | None:
+    """Image URL for a step, from _image_url_cache or a fresh _search_image()."""
+    return await _image_url_cache.get_or_fetch(
+        normalize_key(step), lambda: _search_image(step, query)
     )
-    query = query_response.choices[0].message.content.strip().strip('"\'')
-    print(f"[context_help] Image query: {query}")
 
+
+async def _search_image(step: str, query: str) -> str | None:
+    """Bing lookup for a step's image query, loosening the search until something turns up."""
     # Search for the simplest, most basic photo
-    image_url = _get_image_url(query + " simple white background")
+    image_url = await _get_image_url(query + " simple white background")
 
     # Fallback: try without the background hint
     if not image_url:
-        print(f"[context_help] No results, retrying without background hint")
-        image_url = _get_image_url(query)
+        logger.info("No results, retrying without background hint")
+        image_url = await _get_image_url(query)
 
     # Last resort: search the raw step text
     if not image_url:
         short_step = " ".join(step.split()[:5])
-        print(f"[context_help] Still no results, trying raw step: {short_step}")
-        image_url = _get_image_url(short_step)
+        logger.info("Still no results, trying raw step: %s", short_step)
+        image_url = await _get_image_url(short_step)
 
-    return {
-        "step": step,
-        "image_url": image_url,
-    }
+    return image_url
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="[%(name)s] %(message)s")
+
     TEST_STEP = "Matcha powder is sifted into a mug"
 
     print(f"Testing step: '{TEST_STEP}'\n")
 
-    print("--- get_step_details ---")
-    print(get_step_details(TEST_STEP))
+    async def _demo():
+        print("--- get_step_details ---")
+        print(await get_step_details(TEST_STEP))
+
+        print("\n--- get_step_image ---")
+        print(await get_step_image(TEST_STEP))
 
-    print("\n--- get_step_image ---")
-    print(get_step_image(TEST_STEP))
+    asyncio.run(_demo())
@@ -1,14 +1,18 @@
+import asyncio
+import codecs
 import json
+import logging
 import re
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
 
-import requests
-from bs4 import BeautifulSoup
-from openai import OpenAI
-from dotenv import load_dotenv
-from chatgpt import _TASK_DECOMP_SYSTEM, _TASK_DECOMP_EXAMPLES
+import httpx
+import orjson
+from cachetools import TTLCache
+from selectolax.lexbor import LexborHTMLParser
+from openai_client import client
+from prompts import TASK_DECOMP_PREFIX
 
-load_dotenv()
-client = OpenAI()
+logger = logging.getLogger(__name__)
 
 
 # ---------------------------------------------------------------------------
@@ -116,11 +120,81 @@ _URL_RECIPE_EXAMPLES = [
 ]
 
 
+# Everything before the user's recipe, built once at import. Sending the same
+# byte-identical prefix on every call lets OpenAI's prompt cache reuse it.
+# Never mutate it.
+_STATIC_MESSAGES = (*TASK_DECOMP_PREFIX, *_URL_RECIPE_EXAMPLES)
+
+
+# ---------------------------------------------------------------------------
+# HTTP client  —  one pooled, keep-alive async client shared by every fetch, so
+# scraping several recipes from the same host skips the TCP + TLS handshake
+# ---------------------------------------------------------------------------
+
+_BROWSER_HEADERS = {
+    # Core identity
+    "User-Agent": (
+        "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/124.0.0.0 Safari/537.36"
+    ),
+    # What Chrome sends on a fresh top-level navigation
+    "Accept": (
+        "text/html,application/xhtml+xml,application/xml;"
+        "q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,"
+        "application/signed-exchange;v=b3;q=0.7"
+    ),
+    "Accept-Language": "en-US,en;q=0.9",
+    "Accept-Encoding": "gzip, deflate, br",  # br needs the brotli package
+    "Cache-Control": "no-cache",
+    "Pragma": "no-cache",
+    "Upgrade-Insecure-Requests": "1",
+    # Sec-Fetch-* headers — Chrome always sends these on navigation
+    "Sec-Fetch-Dest": "document",
+    "Sec-Fetch-Mode": "navigate",
+    "Sec-Fetch-Site": "none",
+    "Sec-Fetch-User": "?1",
+    # Client hints
+    "Sec-Ch-Ua": '"Chromium";v="124", "Google Chrome";v="124", "Not-A.Brand";v="99"',
+    "Sec-Ch-Ua-Mobile": "?0",
+    "Sec-Ch-Ua-Platform": '"macOS"',
+}
+
+# Recipe JSON-LD sits near the top of the page; anything past this is inlined
+# images, ad scripts and comments we would only throw away
+_MAX_HTML_BYTES = 256 * 1024
+
+_HTTP = httpx.AsyncClient(
+    headers=_BROWSER_HEADERS,
+    transport=httpx.AsyncHTTPTransport(
+        retries=2,  # connection failures only
+        limits=httpx.Limits(max_connections=50, max_keepalive_connections=20),
+    ),
+    timeout=12,
+    follow_redirects=True,
+)
+
+
 # ---------------------------------------------------------------------------
 # Structured recipe extraction
 # ---------------------------------------------------------------------------
 
-def fetch_recipe(url: str) -> str:
+# Canonical URL -> extracted recipe text. Recipe pages barely change, so a day
+# of reuse is safe and skips both the download and the parse.
+_recipe_cache: TTLCache = TTLCache(maxsize=1024, ttl=24 * 60 * 60)
+
+
+def _canonical_url(url: str) -> str:
+    """Cache key for a recipe URL: lowercase host, no fragment, utm_* tracking params dropped."""
+    parts = urlsplit(url.strip())
+    query = urlencode([
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith("utm_")
+    ])
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, query, ""))
+
+
+async def fetch_recipe(url: str) -> str:
     """
     Fetch a recipe page and return its content as a clean text string.
 
@@ -133,86 +207,102 @@ def fetch_recipe(url: str) -> str:
                     capped at 4 000 chars so we stay within GPT context.
       4. If the page can't be fetched at all (e.g. 403), return the URL so
          GPT can still attempt generation from its training data.
+
+    Successful extractions are cached per canonical URL for a day.
     """
-    html = _fetch_html(url)
+    key = _canonical_url(url)
+    cached = _recipe_cache.get(key)
+    if cached is not None:
+        return cached
+
+    html = await _fetch_html(url)
 
     if html is None:
-        # Site blocked us — let GPT try from training data
-        print(f"[onlinerecipe] Could not fetch page, passing URL to GPT: {url}")
+        # Site blocked us — let GPT try from training data. Not cached, so the
+        # next request tries the page again.
+        logger.warning("Could not fetch page, passing URL to GPT: %s", url)
         return url
 
-    soup = BeautifulSoup(html, "lxml")
+    # Parsing a large page is tens of ms of pure CPU — keep it off the event loop
+    text = await asyncio.to_thread(_extract_recipe_text, html)
+    _recipe_cache[key] = text
+    return text
+
+
+def _extract_recipe_text(html: bytes) -> str:
+    """Run the JSON-LD → microdata → visible-text strategy over a fetched page."""
+    # Try structured data first. JSON-LD is scanned straight out of the raw
+    # HTML, so the common case never pays for building a DOM.
+    data = _extract_jsonld(html)
+    if data:
+        text = _format_structured(data)
+        if text:
+            return text
+
+    # One lexbor parse serves both the microdata lookup and the text fallback
+    tree = LexborHTMLParser(html)
 
-    # Try structured data first
-    data = _extract_jsonld(soup) or _extract_microdata(soup)
+    data = _extract_microdata(tree)
     if data:
         text = _format_structured(data)
         if text:
             return text
 
     # Fallback: remove noise and dump visible text
-    for tag in soup(["script", "style", "nav", "footer", "header"]):
-        tag.decompose()
-    return soup.get_text(separator=" ", strip=True)[:4000]
+    tree.strip_tags(["script", "style", "nav", "footer", "header"])
+    if tree.body is None:
+        return ""
+    return tree.body.text(separator=" ", strip=True)[:4000]
 
 
-def _fetch_html(url: str) -> str | None:
+async def _fetch_html(url: str) -> bytes | None:
     """
     Fetch the raw HTML for a URL, mimicking a real Chrome browser as closely
     as possible to avoid bot-detection 403s on sites like AllRecipes.
 
-    Uses a persistent Session (so cookies set on redirect are kept) and sends
-    the full set of headers Chrome sends on a fresh top-level navigation.
+    Goes through the shared _HTTP client, so cookies set on redirect are kept
+    and repeat fetches from the same host reuse a warm keep-alive connection.
+    The body is streamed and cut off after _MAX_HTML_BYTES.
 
+    Returns the body as UTF-8 bytes — both the JSON-LD scan and lexbor work on
+    bytes directly, so a UTF-8 page (nearly all of them) is never decoded to str.
     Returns None if the request fails for any reason.
     """
-    session = requests.Session()
-    headers = {
-        # Core identity
-        "User-Agent": (
-            "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
-            "AppleWebKit/537.36 (KHTML, like Gecko) "
-            "Chrome/124.0.0.0 Safari/537.36"
-        ),
-        # What Chrome sends on a fresh top-level navigation
-        "Accept": (
-            "text/html,application/xhtml+xml,application/xml;"
-            "q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,"
-            "application/signed-exchange;v=b3;q=0.7"
-        ),
-        "Accept-Language": "en-US,en;q=0.9",
-        "Accept-Encoding": "gzip, deflate",
-        "Cache-Control": "no-cache",
-        "Pragma": "no-cache",
-        "Upgrade-Insecure-Requests": "1",
-        # Sec-Fetch-* headers — Chrome always sends these on navigation
-        "Sec-Fetch-Dest": "document",
-        "Sec-Fetch-Mode": "navigate",
-        "Sec-Fetch-Site": "none",
-        "Sec-Fetch-User": "?1",
-        # Client hints
-        "Sec-Ch-Ua": '"Chromium";v="124", "Google Chrome";v="124", "Not-A.Brand";v="99"',
-        "Sec-Ch-Ua-Mobile": "?0",
-        "Sec-Ch-Ua-Platform": '"macOS"',
-    }
     try:
-        resp = session.get(url, headers=headers, timeout=12, allow_redirects=True)
-        resp.raise_for_status()
-        return resp.text
-    except requests.exceptions.HTTPError as e:
-        print(f"[onlinerecipe] HTTP {e.response.status_code} fetching {url}")
+        async with _HTTP.stream("GET", url) as resp:
+            resp.raise_for_status()
+            buf = bytearray()
+            async for chunk in resp.aiter_bytes(chunk_size=16384):
+                buf += chunk
+                if len(buf) >= _MAX_HTML_BYTES:
+                    break
+            encoding = resp.charset_encoding or "utf-8"
+        body = bytes(buf[:_MAX_HTML_BYTES])
+        try:
+            encoding = codecs.lookup(encoding).name
+        except LookupError:
+            encoding = "utf-8"  # unknown charset label — parse the bytes as UTF-8
+        if encoding != "utf-8":
+            body = body.decode(encoding, errors="replace").encode()
+        return body
+    except httpx.HTTPStatusError as e:
+        logger.warning("HTTP %s fetching %s", e.response.status_code, url)
         return None
     except Exception as e:
-        print(f"[onlinerecipe] fetch failed for {url}: {e}")
+        logger.warning("fetch failed for %s: %s", url, e)
         return None
 
 
-def _extract_jsonld(soup: BeautifulSoup) -> dict | None:
+# Body of every <script type="application/ld+json"> block
+_JSONLD_RE = re.compile(rb"<script[^>]*application/ld\+json[^>]*>(.*?)</script>", re.S | re.I)
+
+
+def _extract_jsonld(html: bytes) -> dict | None:
     """Find a schema.org/Recipe object inside any JSON-LD <script> tag."""
-    for script in soup.find_all("script", type="application/ld+json"):
+    for match in _JSONLD_RE.finditer(html):
         try:
-            data = json.loads(script.string or "")
-        except (json.JSONDecodeError, TypeError):
+            data = orjson.loads(match.group(1))
+        except orjson.JSONDecodeError:
             continue
 
         # Could be a bare object, a list, or wrapped in @graph
@@ -233,32 +323,37 @@ def _extract_jsonld(soup: BeautifulSoup) -> dict | None:
     return None
 
 
-def _extract_microdata(soup: BeautifulSoup) -> dict | None:
+# Microdata selectors — itemtype may be http(s) and any case
+_RECIPE_SEL       = '[itemtype*="schema.org/Recipe" i]'
+_NAME_SEL         = '[itemprop="name"]'
+_INGREDIENT_SEL   = '[itemprop="recipeIngredient"]'
+_INSTRUCTIONS_SEL = '[itemprop="recipeInstructions"]'
+
+
+def _extract_microdata(tree: LexborHTMLParser) -> dict | None:
     """Extract recipe from HTML microdata (itemtype=schema.org/Recipe)."""
-    recipe_el = soup.find(
-        attrs={"itemtype": re.compile(r"schema\.org/Recipe", re.I)}
-    )
-    if not recipe_el:
+    recipe_el = tree.css_first(_RECIPE_SEL)
+    if recipe_el is None:
         return None
 
     result: dict = {}
 
-    name_el = recipe_el.find(attrs={"itemprop": "name"})
-    if name_el:
-        result["name"] = name_el.get_text(strip=True)
+    name_el = recipe_el.css_first(_NAME_SEL)
+    if name_el is not None:
+        result["name"] = name_el.text(strip=True)
 
     ingredients = [
-        el.get_text(strip=True)
-        for el in recipe_el.find_all(attrs={"itemprop": "recipeIngredient"})
-        if el.get_text(strip=True)
+        text
+        for el in recipe_el.css(_INGREDIENT_SEL)
+        if (text := el.text(strip=True))
     ]
     if ingredients:
         result["recipeIngredient"] = ingredients
 
     instructions = [
-        el.get_text(separator=" ", strip=True)
-        for el in recipe_el.find_all(attrs={"itemprop": "recipeInstructions"})
-        if el.get_text(separator=" ", strip=True)
+        text
+        for el in recipe_el.css(_INSTRUCTIONS_SEL)
+        if (text := el.text(separator=" ", strip=True))
     ]
     if instructions:
         result["recipeInstructions"] = instructions
@@ -303,6 +398,9 @@ def _flatten_instructions(instructions) -> list[str]:
         return []
     if isinstance(instructions, str):
         return [s.strip() for s in instructions.splitlines() if s.strip()]
+    # Common shape: a flat list of strings — no per-item dispatch needed
+    if all(isinstance(item, str) for item in instructions):
+        return [s for item in instructions if (s := item.strip())]
 
     steps: list[str] = []
     for item in instructions:
@@ -323,7 +421,7 @@ def _flatten_instructions(instructions) -> list[str]:
 # GPT step generation from URL
 # ---------------------------------------------------------------------------
 
-def steps_from_url(url: str, avoid: list[str] | None = None) -> list[str]:
+async def steps_from_url(url: str, avoid: list[str] | None = None) -> list[str]:
     """
     Fetch a recipe from a URL and return camera-verifiable steps.
 
@@ -334,26 +432,57 @@ def steps_from_url(url: str, avoid: list[str] | None = None) -> list[str]:
     Returns:
         List of step strings in order.
     """
-    print(f"[onlinerecipe] Fetching: {url}")
-    recipe_text = fetch_recipe(url)
+    logger.info("Fetching: %s", url)
+    recipe_text = await fetch_recipe(url)
 
-    # Build the user message — include allergen note if needed
-    user_content = f"Here is a recipe. Break it into camera-verifiable steps:\n\n{recipe_text}"
+    messages = [
+        *_STATIC_MESSAGES,
+        {"role": "user", "content": f"Here is a recipe. Break it into camera-verifiable steps:\n\n{recipe_text}"},
+    ]
+    # Allergen note goes in its own trailing message so the recipe text stays
+    # part of a shared prefix across allergen variants of the same recipe
     if avoid:
-        user_content += f"\n\nSubstitute these allergens with safe alternatives: {', '.join(avoid)}"
-
-    messages = [{"role": "system", "content": _TASK_DECOMP_SYSTEM}]
-    messages.extend(_TASK_DECOMP_EXAMPLES)
-    messages.extend(_URL_RECIPE_EXAMPLES)
-    messages.append({"role": "user", "content": user_content})
+        messages.append({
+            "role": "user",
+            "content": f"Substitute these allergens with safe alternatives: {', '.join(avoid)}",
+        })
 
-    response = client.chat.completions.create(
+    response = await client.chat.completions.create(
         model="gpt-4o",
         messages=messages,
         temperature=0.3,
     )
 
-    return json.loads(response.choices[0].message.content.strip())
+    return orjson.loads(response.choices[0].message.content.strip())
+
+
+async def steps_from_urls(
+    urls: list[str],
+    avoid: list[str] | None = None,
+    max_concurrency: int = 8,
+) -> list[list[str] | None]:
+    """
+    Run steps_from_url over several recipe links concurrently.
+
+    Args:
+        urls:            Recipe page links.
+        avoid:           Optional allergens to substitute, applied to every recipe.
+        max_concurrency: Most recipes fetched + generated at once.
+
+    Returns:
+        One step list per URL, in the same order. None where that URL failed.
+    """
+    sem = asyncio.Semaphore(max_concurrency)
+
+    async def _one(url: str) -> list[str] | None:
+        async with sem:
+            try:
+                return await steps_from_url(url, avoid=avoid)
+            except Exception as e:
+                logger.warning("Step generation failed for %s: %s", url, e)
+                return None
+
+    return await asyncio.gather(*[_one(url) for url in urls])
 
 
 # ---------------------------------------------------------------------------
@@ -362,13 +491,16 @@ def steps_from_url(url: str, avoid: list[str] | None = None) -> list[str]:
 
 if __name__ == "__main__":
     import sys
+
+    logging.basicConfig(level=logging.INFO, format="[%(name)s] %(message)s")
+
     test_url = (
         sys.argv[1]
         if len(sys.argv) > 1
         else "https://www.allrecipes.com/recipe/10813/best-chocolate-chip-cookies/"
     )
     try:
-        steps = steps_from_url(test_url)
+        steps = asyncio.run(steps_from_url(test_url))
         print("\nSteps:")
         for i, step in enumerate(steps, 1):
             print(f"  {i}. {step}")
@@ -0,0 +1,137 @@
+import logging
+import orjson
+
+from openai_client import sync_client as client
+from prompts import DETAILS_SYSTEM, IMAGE_QUERY_SYSTEM
+
+logger = logging.getLogger(__name__)
+
+
+# ---------------------------------------------------------------------------
+# Batch step hydration — for when nobody is waiting on the result
+#
+# Real-time lookups (/step/details, /step/image) stay on the live API.
+# This path pre-hydrates a whole saved recipe in one job: OpenAI runs the
+# requests server-side within the completion window at half the token price.
+# ---------------------------------------------------------------------------
+
+# Result key -> system prompt. Each step gets one request per entry.
+_STEP_PROMPTS = {
+    "details":     DETAILS_SYSTEM,
+    "image_query": IMAGE_QUERY_SYSTEM,
+}
+
+_FAILED_STATUSES = ("failed", "expired", "cancelling", "cancelled")
+
+
+def _batch_line(custom_id: str, system: str, step: str) -> bytes:
+    """One JSONL request line for the /v1/chat/completions batch endpoint."""
+    return orjson.dumps(
+        {
+            "custom_id": custom_id,
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {
+                "model": "gpt-4o",
+                "messages": [
+                    {"role": "system", "content": system},
+                    {"role": "user", "content": f"Step: {step}"},
+                ],
+                "temperature": 0.3,
+            },
+        },
+        option=orjson.OPT_APPEND_NEWLINE,
+    )
+
+
+def submit_step_batch(steps: list[str]) -> str:
+    """
+    Queue details + image-search queries for every step as one OpenAI batch job.
+
+    Args:
+        steps: Ordered recipe steps.
+
+    Returns:
+        The batch id to pass to poll_and_fetch().
+    """
+    jsonl = b"".join(
+        _batch_line(f"step_{i}_{kind}", system, step)
+        for i, step in enumerate(steps)
+        for kind, system in _STEP_PROMPTS.items()
+    )
+    input_file = client.files.create(file=("steps.jsonl", jsonl), purpose="batch")
+    batch = client.batches.create(
+        input_file_id=input_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h",
+    )
+    logger.info("Submitted %d steps as batch %s", len(steps), batch.id)
+    return batch.id
+
+
+def poll_and_fetch(batch_id: str) -> dict | None:
+    """
+    Check a batch job and, once it has finished, reassemble its results per step.
+
+    Returns:
+        {step: {"details": str | None, "image_query": str | None}} when complete,
+        or None while the batch is still running.
+
+    Raises:
+        RuntimeError: if the batch failed, expired or was cancelled.
+    """
+    batch = client.batches.retrieve(batch_id)
+    if batch.status in _FAILED_STATUSES:
+        raise RuntimeError(f"Batch {batch_id} ended with status '{batch.status}'")
+    if batch.status != "completed":
+        return None
+
+    # custom_ids only carry the step index — recover the step text from our own input file
+    steps: dict[str, str] = {}
+    for line in client.files.content(batch.input_file_id).text.splitlines():
+        request = orjson.loads(line)
+        _, index, _ = request["custom_id"].split("_", 2)
+        steps[index] = request["body"]["messages"][-1]["content"].removeprefix("Step: ")
+
+    results = {step: {kind: None for kind in _STEP_PROMPTS} for step in steps.values()}
+
+    # A batch where every request errored has no output file
+    if batch.output_file_id:
+        for line in client.files.content(batch.output_file_id).text.splitlines():
+            item = orjson.loads(line)
+            _, index, kind = item["custom_id"].split("_", 2)
+            response = item.get("response") or {}
+            if response.get("status_code") != 200:
+                logger.warning("%s failed: %s", item["custom_id"], item.get("error"))
+                continue
+
+            content = response["body"]["choices"][0]["message"]["content"].strip()
+            if kind == "image_query":
+                content = content.strip('"\'')
+            results[steps[index]][kind] = content
+
+    return results
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    logging.basicConfig(level=logging.INFO, format="[%(name)s] %(message)s")
+
+    if len(sys.argv) > 1:
+        batch_id = sys.argv[1]
+    else:
+        batch_id = submit_step_batch([
+            "A mug is placed on the counter",
+            "Matcha powder is sifted into a mug",
+        ])
+
+    results = poll_and_fetch(batch_id)
+    while results is None:
+        logger.info("%s still running...", batch_id)
+        time.sleep(30)
+        results = poll_and_fetch(batch_id)
+
+    for step, context in results.items():
+        print(f"\n{step}\n  details:     {context['details']}\n  image_query: {context['image_query']}")
@@ -0,0 +1,32 @@
+import atexit
+
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, DefaultHttpxClient, OpenAI
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+# ---------------------------------------------------------------------------
+# Shared OpenAI clients  —  every module imports these instead of building its
+# own, so all GPT traffic shares one keep-alive connection pool per flavour
+#
+#   client       async, for code running on the event loop
+#   sync_client  for the camera worker threads and other blocking callers
+# ---------------------------------------------------------------------------
+
+_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=25)
+_TIMEOUT = 60.0
+
+# HTTP/2 multiplexes a burst of GPT, TTS and Whisper calls over a few warm
+# connections instead of a TLS handshake per parallel request
+client = AsyncOpenAI(
+    http_client=DefaultAsyncHttpxClient(limits=_LIMITS, timeout=_TIMEOUT, http2=True),
+)
+
+sync_client = OpenAI(
+    http_client=DefaultHttpxClient(limits=_LIMITS, timeout=_TIMEOUT, http2=True),
+)
+
+# The async client needs a running loop to close — the server lifespan does it
+atexit.register(sync_client.close)
@@ -1,24 +1,144 @@
 import asyncio
-import json
+import atexit
+import logging
+import logging.handlers
+import queue
 import threading
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
 
-from fastapi import FastAPI
+import orjson
+from fastapi import FastAPI, Request
+from openai import APIStatusError
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
-from chatgpt import generate_task_steps
-from camera import get_camo_feed, set_current_step, set_current_recipe, results_queue, audio_running, get_latest_frame_jpeg, stop_pipeline
-from context_help import get_step_details, get_step_image
+from chatgpt import generate_task_steps, generate_task_steps_stream
+from camera import get_camo_feed, set_current_step, set_current_recipe, set_result_listener, set_frame_listener, audio_running, get_latest_frame_jpeg_async, stop_pipeline
+from context_help import get_step_details, get_all_step_details, get_step_image, get_all_step_images, seed_step_context, _BING_CLIENT
 from caution import get_safety_caution, get_allergens, get_recipe_allergens
-from onlinerecipe import steps_from_url, fetch_recipe
-from openai import OpenAI as _OpenAI
-from dotenv import load_dotenv as _load_dotenv
+from onlinerecipe import steps_from_url, steps_from_urls, fetch_recipe, _HTTP as _recipe_http
+from openai_batch import submit_step_batch, poll_and_fetch
+from async_cache import InFlight, normalize_key
+from openai_client import client as _openai_client
+
+# ---------------------------------------------------------------------------
+# Logging  —  request handlers only enqueue records; a listener thread does
+# the actual stderr write, so no handler blocks on the stream lock
+# ---------------------------------------------------------------------------
+
+def _configure_logging():
+    log_queue: queue.Queue = queue.Queue()
+    stderr_handler = logging.StreamHandler()
+    stderr_handler.setFormatter(logging.Formatter("[%(name)s] %(message)s"))
+    listener = logging.handlers.QueueListener(log_queue, stderr_handler)
+
+    root = logging.getLogger()
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(logging.INFO)
+    # httpx logs every request at INFO — keep only its warnings
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    listener.start()
+    atexit.register(listener.stop)
+
+_configure_logging()
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Live results  —  camera worker threads hand each AI result to the event loop,
+# which fans it out to one queue per connected /stream client
+# ---------------------------------------------------------------------------
+
+_SSE_QUEUE_SIZE = 64  # per client; a client this far behind loses its oldest step checks
+_SSE_HEARTBEAT_SECONDS = 15.0  # comment line on a quiet stream, keeps proxies from timing it out
+_loop: asyncio.AbstractEventLoop | None = None
+
+
+@dataclass(eq=False)  # identity hashing, so instances can live in a set
+class SseSubscriber:
+    """
+    One /stream client's undelivered events, oldest first. Once the backlog is
+    full the oldest step_check makes room — a stale frame check is worth
+    nothing, but a speech reply is the user's answer and is never dropped.
+    """
+    pending: deque[tuple[bool, bytes]] = field(default_factory=deque)  # (droppable, event)
+    ready: asyncio.Event = field(default_factory=asyncio.Event)
+
+    def put(self, event: bytes, droppable: bool):
+        if len(self.pending) >= _SSE_QUEUE_SIZE:
+            for i, (is_droppable, _) in enumerate(self.pending):
+                if is_droppable:
+                    del self.pending[i]
+                    break
+        self.pending.append((droppable, event))
+        self.ready.set()
+
+    def drain(self) -> list[bytes]:
+        events = [event for _, event in self.pending]
+        self.pending.clear()
+        self.ready.clear()
+        return events
+
+
+_sse_subscribers: set[SseSubscriber] = set()
+
+
+def _push_result(result: dict):
+    """Result listener for camera.py — runs on a worker thread."""
+    _loop.call_soon_threadsafe(_broadcast_result, result)
+
+
+def _broadcast_result(result: dict):
+    """Hand a result to every connected /stream client. Loop thread only."""
+    if not _sse_subscribers:
+        return
+    # Serialise once; every subscriber gets the same ready-to-send event bytes
+    event = b"data: " + orjson.dumps(result) + b"\n\n"
+    droppable = result.get("type") == "step_check"
+    for subscriber in _sse_subscribers:
+        subscriber.put(event, droppable)
+
+
+def _flush_sse_queues():
+    """Drop undelivered results so a new session never sees the last one's. Loop thread only."""
+    for subscriber in _sse_subscribers:
+        subscriber.drain()
+
+
+# One wake-up event per /camera/feed viewer, set whenever the camera captures
+# a frame or stops
+_feed_waiters: set[asyncio.Event] = set()
+
+
+def _push_frame():
+    """Frame listener for camera.py — runs on the capture thread."""
+    _loop.call_soon_threadsafe(_wake_feeds)
 
-_load_dotenv()
-_openai_client = _OpenAI()
 
-app = FastAPI()
+def _wake_feeds():
+    for waiter in _feed_waiters:
+        waiter.set()
+
+
+@asynccontextmanager
+async def _lifespan(app: FastAPI):
+    global _loop
+    _loop = asyncio.get_running_loop()
+    set_result_listener(_push_result)
+    set_frame_listener(_push_frame)
+    yield
+    set_result_listener(None)
+    set_frame_listener(None)
+    # Shared HTTP clients hold keep-alive / HTTP/2 connections — close them on the loop
+    await _openai_client.close()
+    await _BING_CLIENT.aclose()
+    await _recipe_http.aclose()
+
+
+app = FastAPI(lifespan=_lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -31,8 +151,37 @@ app.add_middleware(
 # Helpers
 # ---------------------------------------------------------------------------
 
+_URL_PREFIXES = ("http://", "https://")
+
+
 def _is_url(s: str) -> bool:
-    return s.startswith("http://") or s.startswith("https://")
+    return s.startswith(_URL_PREFIXES)
+
+
+# Identical generations running at the same time (double-clicks, retries)
+# share one GPT call instead of each paying for their own
+_recipe_inflight = InFlight()
+
+
+async def _recipe_steps(food: str, avoid: list[str] | None = None) -> list[str]:
+    """Steps for a food name or recipe URL, coalesced with any identical request already running."""
+    key = (food.strip() if _is_url(food) else normalize_key(food), tuple(sorted(avoid or ())))
+
+    async def _generate() -> list[str]:
+        if _is_url(food):
+            return await steps_from_url(food, avoid=avoid)
+        return await asyncio.to_thread(generate_task_steps, food, avoid=avoid)
+
+    return await _recipe_inflight.run(key, _generate)
+
+
+# Streaming response headers, shared by every request — Starlette only reads them
+_SSE_HEADERS = {
+    "Cache-Control":     "no-cache",
+    "Connection":        "keep-alive",
+    "X-Accel-Buffering": "no",   # disable nginx buffering if behind a proxy
+}
+_NO_CACHE_HEADERS = {"Cache-Control": "no-cache"}
 
 # ---------------------------------------------------------------------------
 # Request models
@@ -44,6 +193,9 @@ class FoodRequest(BaseModel):
 class StepRequest(BaseModel):
     step: str
 
+class StepsRequest(BaseModel):
+    steps: list[str]
+
 class StartRequest(BaseModel):
     camera_index: int | None = None
     recipe: str | None = None       # e.g. "spaghetti carbonara"
@@ -57,50 +209,175 @@ class SafeRecipeRequest(BaseModel):
     food: str
     avoid: list[str] = []
 
+class RecipeUrlsRequest(BaseModel):
+    urls: list[str]
+    avoid: list[str] = []
+
+# ---------------------------------------------------------------------------
+# Response models  —  declaring them as return types lets FastAPI serialise
+# straight to JSON bytes in pydantic-core, skipping jsonable_encoder + json.dumps
+# ---------------------------------------------------------------------------
+
+class RecipeStepsResponse(BaseModel):
+    steps: list[str]
+
+class UrlRecipe(BaseModel):
+    url: str
+    steps: list[str] | None
+
+class UrlRecipesResponse(BaseModel):
+    recipes: list[UrlRecipe]
+
+class AllergensResponse(BaseModel):
+    allergens: list[str] | None
+
+class SetStepResponse(BaseModel):
+    ok: bool
+    step: str
+
+class StepDetails(BaseModel):
+    step: str
+    details: str
+
+class StepDetailsBatchResponse(BaseModel):
+    steps: list[StepDetails]
+
+class StepImage(BaseModel):
+    step: str
+    image_url: str | None
+
+class StepImageBatchResponse(BaseModel):
+    steps: list[StepImage]
+
+class SafetyResponse(BaseModel):
+    caution: str | None
+    tip: str | None
+
 # ---------------------------------------------------------------------------
 # State
 # ---------------------------------------------------------------------------
 
-_camera_thread: threading.Thread | None = None
+@dataclass
+class CameraRunner:
+    """The camera pipeline thread, plus a lock so start/stop requests never interleave."""
+    thread: threading.Thread | None = None
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+    def is_running(self) -> bool:
+        return self.thread is not None and self.thread.is_alive()
+
+
+_camera = CameraRunner()
 
 # ---------------------------------------------------------------------------
 # Recipe
 # ---------------------------------------------------------------------------
 
 @app.post("/recipe/generate")
-def generate(req: FoodRequest):
+async def generate(req: FoodRequest) -> RecipeStepsResponse:
     """Generate ordered recipe steps for a given food or recipe URL."""
-    if _is_url(req.food):
-        steps = steps_from_url(req.food)
-    else:
-        steps = generate_task_steps(req.food)
-    return {"steps": steps}
+    return {"steps": await _recipe_steps(req.food)}
+
+
+@app.post("/recipe/from-urls-batch")
+async def generate_from_urls(req: RecipeUrlsRequest) -> UrlRecipesResponse:
+    """Generate steps for several recipe URLs at once. steps is null for a URL that failed."""
+    results = await steps_from_urls(req.urls, avoid=req.avoid or None)
+    return {"recipes": [{"url": url, "steps": steps} for url, steps in zip(req.urls, results)]}
 
 
 @app.post("/recipe/allergens")
-def recipe_allergens(req: FoodRequest):
+async def recipe_allergens(req: FoodRequest) -> AllergensResponse:
     """Scan the whole recipe for all potentially allergenic ingredients."""
     if _is_url(req.food):
         # Fetch the real ingredient list from the page for accurate allergen scanning
-        recipe_text = fetch_recipe(req.food)
-        allergens = get_recipe_allergens(recipe_text)
+        recipe_text = await fetch_recipe(req.food)
+        allergens = await get_recipe_allergens(recipe_text)
     else:
-        allergens = get_recipe_allergens(req.food)
+        allergens = await get_recipe_allergens(req.food)
     return {"allergens": allergens}
 
 
 @app.post("/recipe/generate-safe")
-def generate_safe(req: SafeRecipeRequest):
+async def generate_safe(req: SafeRecipeRequest) -> RecipeStepsResponse:
     """Generate recipe steps with allergen substitutions."""
-    if _is_url(req.food):
-        steps = steps_from_url(req.food, avoid=req.avoid or None)
-    else:
-        steps = generate_task_steps(req.food, avoid=req.avoid or None)
-    return {"steps": steps}
+    return {"steps": await _recipe_steps(req.food, avoid=req.avoid or None)}
+
+
+@app.post("/recipe/generate-stream")
+async def generate_stream(req: SafeRecipeRequest):
+    """
+    Server-Sent Events stream of recipe steps, emitted while GPT is still writing them.
+    Details + image for each step are fetched as soon as that step arrives, so
+    hydration overlaps with generation instead of waiting for the whole list.
+
+    Events, in arrival order:
+    { "type": "step",         "index": int, "step": str }
+    { "type": "step_context", "index": int, "details": str | null, "image_url": str | null }
+    { "type": "done" }
+    """
+    events: asyncio.Queue = asyncio.Queue()
+    avoid = req.avoid or None
+
+    async def _produce_steps():
+        try:
+            if _is_url(req.food):
+                for step in await steps_from_url(req.food, avoid=avoid):
+                    events.put_nowait(step)
+            else:
+                # Runs on the loop, so cancelling the producer closes the GPT stream
+                async for step in generate_task_steps_stream(req.food, avoid=avoid):
+                    events.put_nowait(step)
+        except Exception as e:
+            logger.warning("Recipe stream generation error: %s", e)
+        finally:
+            events.put_nowait(None)  # sentinel
+
+    async def _hydrate(index: int, step: str):
+        context = {"type": "step_context", "index": index, "details": None, "image_url": None}
+        try:
+            details, image = await asyncio.gather(
+                get_step_details(step),
+                get_step_image(step, recipe=req.food),
+            )
+            context["details"] = details["details"]
+            context["image_url"] = image["image_url"]
+        except Exception as e:
+            logger.warning("Recipe stream hydration error for step %d: %s", index + 1, e)
+        events.put_nowait(context)
+
+    async def event_generator():
+        producer = asyncio.create_task(_produce_steps())
+        hydrating: dict[int, asyncio.Task] = {}
+        generating = True
+        index = 0
+        try:
+            while generating or hydrating:
+                item = await events.get()
+                if item is None:
+                    generating = False
+                elif isinstance(item, str):
+                    yield b"data: " + orjson.dumps({"type": "step", "index": index, "step": item}) + b"\n\n"
+                    hydrating[index] = asyncio.create_task(_hydrate(index, item))
+                    index += 1
+                else:
+                    hydrating.pop(item["index"], None)
+                    yield b"data: " + orjson.dumps(item) + b"\n\n"
+            yield b"data: " + orjson.dumps({"type": "done"}) + b"\n\n"
+        finally:
+            producer.cancel()
+            for task in hydrating.values():
+                task.cancel()
+
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers=_SSE_HEADERS,
+    )
 
 
 @app.post("/recipe/set-step")
-def update_step(req: StepRequest):
+async def update_step(req: StepRequest) -> SetStepResponse:
     """Tell the camera which step to actively check for."""
     set_current_step(req.step)
     return {"ok": True, "step": req.step}
@@ -110,41 +387,51 @@ def update_step(req: StepRequest):
 # ---------------------------------------------------------------------------
 
 @app.post("/camera/start")
-def start_camera(req: StartRequest):
+async def start_camera(req: StartRequest):
     """Start the camera feed + AI pipeline in a background thread."""
-    global _camera_thread
-
-    # If a previous run is still winding down, stop it and wait up to 3 s
-    if _camera_thread and _camera_thread.is_alive():
-        stop_pipeline()
-        _camera_thread.join(timeout=3.0)
-        if _camera_thread.is_alive():
-            return {"ok": False, "message": "Camera still shutting down — try again in a moment"}
-
-    # Store recipe context so Remy knows what's being cooked
-    if req.recipe:
-        set_current_recipe(req.recipe, req.steps)
-
-    # Set audio_running BEFORE returning so the /camera/feed generator
-    # is already live when the frontend renders the <img> tag.
-    audio_running.set()
-
-    _camera_thread = threading.Thread(
-        target=get_camo_feed,
-        kwargs={"camera_index": req.camera_index},
-        daemon=True,
-    )
-    _camera_thread.start()
-    return {"ok": True}
+    # Held throughout, so two near-simultaneous starts can't both see no
+    # running thread and open the camera twice
+    async with _camera.lock:
+        # If a previous run is still winding down, stop it and wait up to 3 s —
+        # joined from a worker thread so the loop keeps serving meanwhile
+        if _camera.is_running():
+            stop_pipeline()
+            _flush_sse_queues()
+            await asyncio.to_thread(_camera.thread.join, 3.0)
+            if _camera.is_running():
+                return {"ok": False, "message": "Camera still shutting down — try again in a moment"}
+
+        # Store recipe context so Remy knows what's being cooked
+        if req.recipe:
+            set_current_recipe(req.recipe, req.steps)
+
+        # Set audio_running BEFORE returning so the /camera/feed generator
+        # is already live when the frontend renders the <img> tag.
+        audio_running.set()
+
+        _camera.thread = threading.Thread(
+            target=get_camo_feed,
+            kwargs={"camera_index": req.camera_index},
+            daemon=True,
+        )
+        _camera.thread.start()
+        return {"ok": True}
 
 
 @app.post("/camera/stop")
-def stop_camera():
+async def stop_camera():
     """Stop the camera feed and AI pipeline, flushing all queues immediately."""
-    stop_pipeline()
+    async with _camera.lock:
+        stop_pipeline()
+        _flush_sse_queues()
     return {"ok": True}
 
 
+# Multipart framing around every JPEG in /camera/feed
+_MJPEG_PREFIX = b"--frame\r\nContent-Type: image/jpeg\r\n\r\n"
+_MJPEG_SUFFIX = b"\r\n"
+
+
 @app.get("/camera/feed")
 async def camera_feed():
     """
@@ -155,19 +442,32 @@ async def camera_feed():
         # Loop only while the camera pipeline is active.
         # When stop_pipeline() clears audio_running this generator exits cleanly,
         # preventing zombie async tasks from accumulating across recipe runs.
-        while audio_running.is_set():
-            jpeg = get_latest_frame_jpeg(quality=70)
-            if jpeg is not None:
-                yield (
-                    b"--frame\r\n"
-                    b"Content-Type: image/jpeg\r\n\r\n" + jpeg + b"\r\n"
-                )
-            await asyncio.sleep(0.04)  # ~25 fps cap
+        # Between frames it sleeps on its wake event, so it sends at the
+        # camera's own rate and notices a stop immediately.
+        new_frame = asyncio.Event()
+        _feed_waiters.add(new_frame)
+        try:
+            last_seq = None
+            while audio_running.is_set():
+                new_frame.clear()
+                seq, jpeg = await get_latest_frame_jpeg_async(quality=70, last_seq=last_seq)
+                if jpeg is not None:
+                    last_seq = seq
+                    # One join, one ASGI message — separate yields would each be a socket write
+                    yield b"".join((_MJPEG_PREFIX, jpeg, _MJPEG_SUFFIX))
+                    continue
+                try:
+                    # Timeout only as a backstop in case a wake-up is ever missed
+                    await asyncio.wait_for(new_frame.wait(), timeout=1.0)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            _feed_waiters.discard(new_frame)
 
     return StreamingResponse(
         generate(),
         media_type="multipart/x-mixed-replace; boundary=frame",
-        headers={"Cache-Control": "no-cache"},
+        headers=_NO_CACHE_HEADERS,
     )
 
 # ---------------------------------------------------------------------------
@@ -175,38 +475,73 @@ async def camera_feed():
 # ---------------------------------------------------------------------------
 
 @app.get("/step/details")
-def step_details(step: str):
+async def step_details(step: str) -> StepDetails:
     """Return a one-sentence how-to explanation for a recipe step."""
-    return get_step_details(step)
+    return await get_step_details(step)
+
+
+@app.post("/step/details-batch")
+async def step_details_batch(req: StepsRequest) -> StepDetailsBatchResponse:
+    """Return how-to explanations for every step at once, fetched concurrently."""
+    return {"steps": await get_all_step_details(req.steps)}
 
 
 @app.get("/step/image")
-def step_image(step: str, recipe: str | None = None):
+async def step_image(step: str, recipe: str | None = None) -> StepImage:
     """Return an image URL showing the completed state of a recipe step."""
-    return get_step_image(step, recipe=recipe)
+    return await get_step_image(step, recipe=recipe)
+
+
+@app.post("/step/image-batch")
+async def step_image_batch(req: StepsRequest) -> StepImageBatchResponse:
+    """Return image URLs for every step at once, GPT queries and Bing lookups pipelined."""
+    return {"steps": await get_all_step_images(req.steps)}
 
 
 @app.get("/step/safety")
-def step_safety(step: str):
+async def step_safety(step: str) -> SafetyResponse:
     """Return a safety caution + tip for a recipe step, or null values if none."""
-    data = get_safety_caution(step)
+    data = await get_safety_caution(step)
     if data is None:
         return {"caution": None, "tip": None}
     return {"caution": data.get("caution"), "tip": data.get("tip")}
 
 
 @app.get("/step/allergens")
-def step_allergens(step: str):
+async def step_allergens(step: str) -> AllergensResponse:
     """Return a list of allergens detected in a recipe step, or null if none."""
-    allergens = get_allergens(step)
+    allergens = await get_allergens(step)
     return {"allergens": allergens}
 
+@app.post("/step/context-batch")
+async def submit_context_batch(req: StepsRequest):
+    """
+    Pre-hydrate a whole recipe (details + image search query per step) via
+    OpenAI's Batch API — half price, but results can take up to 24 h.
+    """
+    return {"ok": True, "batch_id": await asyncio.to_thread(submit_step_batch, req.steps)}
+
+
+@app.get("/step/context-batch/{batch_id}")
+async def context_batch(batch_id: str):
+    """Return batch results keyed by step once ready; "steps" is null while still running."""
+    try:
+        steps = await asyncio.to_thread(poll_and_fetch, batch_id)
+    except RuntimeError as e:
+        return {"ok": False, "message": str(e)}
+    except APIStatusError as e:
+        # Unknown, mistyped or expired batch_id
+        return {"ok": False, "message": f"Batch {batch_id} unavailable: {e.message}"}
+    if steps is not None:
+        seed_step_context(steps)
+    return {"ok": True, "steps": steps}
+
 # ---------------------------------------------------------------------------
 # SSE stream  —  frontend subscribes here to get live AI results
 # ---------------------------------------------------------------------------
 
 @app.get("/stream")
-async def stream():
+async def stream(request: Request):
     """
     Server-Sent Events stream.
     Each event is a JSON object:
@@ -228,23 +563,28 @@ async def stream():
         "step": "<current step label>",
         "data": "<AI response string>"
     }
+
+    A ": ping" comment is sent after every quiet stretch of _SSE_HEARTBEAT_SECONDS.
     """
     async def event_generator():
-        while True:
-            try:
-                result = results_queue.get_nowait()
-                yield f"data: {json.dumps(result)}\n\n"
-            except Exception:
-                await asyncio.sleep(0.1)
+        subscriber = SseSubscriber()
+        _sse_subscribers.add(subscriber)
+        try:
+            while not await request.is_disconnected():
+                try:
+                    await asyncio.wait_for(subscriber.ready.wait(), timeout=_SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield b": ping\n\n"
+                    continue
+                # Everything that piled up goes out in the same write
+                yield b"".join(subscriber.drain())
+        finally:
+            _sse_subscribers.discard(subscriber)
 
     return StreamingResponse(
         event_generator(),
         media_type="text/event-stream",
-        headers={
-            "Cache-Control":     "no-cache",
-            "Connection":        "keep-alive",
-            "X-Accel-Buffering": "no",   # disable nginx buffering if behind a proxy
-        },
+        headers=_SSE_HEADERS,
     )
 
 
@@ -259,36 +599,21 @@ async def tts(req: TTSRequest):
     Returns MP3 audio as a streaming response.
     Frontend should stop any playing audio and replace it when a new response arrives.
     """
-    import queue as _queue
-    chunk_queue: _queue.Queue = _queue.Queue()
-
-    def _generate_audio():
-        try:
-            with _openai_client.audio.speech.with_streaming_response.create(
-                model="tts-1",
-                voice=req.voice,
-                input=req.text,
-                response_format="mp3",
-            ) as response:
-                for chunk in response.iter_bytes(chunk_size=4096):
-                    chunk_queue.put(chunk)
-        finally:
-            chunk_queue.put(None)  # sentinel
-
-    threading.Thread(target=_generate_audio, daemon=True).start()
-
     async def _stream():
-        loop = asyncio.get_event_loop()
-        while True:
-            chunk = await loop.run_in_executor(None, chunk_queue.get)
-            if chunk is None:
-                break
-            yield chunk
+        # Straight off the async client's httpx stream — no thread, no queue
+        async with _openai_client.audio.speech.with_streaming_response.create(
+            model="tts-1",
+            voice=req.voice,
+            input=req.text,
+            response_format="mp3",
+        ) as response:
+            async for chunk in response.iter_bytes(chunk_size=4096):
+                yield chunk
 
     return StreamingResponse(
         _stream(),
         media_type="audio/mpeg",
-        headers={"Cache-Control": "no-cache"},
+        headers=_NO_CACHE_HEADERS,
     )
 
 
@@ -298,4 +623,15 @@ async def tts(req: TTSRequest):
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run("server:app", host="0.0.0.0", port=8000, reload=False)
+    # One worker, on purpose: the camera, mic and live-result fan-out are
+    # per-process state, so a second worker would serve /stream and
+    # /camera/feed from a pipeline that never started
+    uvicorn.run(
+        "server:app",
+        host="0.0.0.0",
+        port=8000,
+        reload=False,
+        workers=1,
+        loop="uvloop",
+        http="httptools",
+    )